@@ -18,10 +18,10 @@ actually takes care of in its API's helpers.
 This module, by contrast, concentrates on wrapping the net-snmp C API
 for SNMP subagents in an easy manner. """
 
-import sys, os, re, inspect, ctypes, socket, struct
-from collections import defaultdict
+import sys, os, re, inspect, ctypes, array, functools
 from netsnmpapi import *
 import netsnmpvartypes
+from netsnmpvartypes import netsnmpAgentException
 
 # Helper function courtesy of Alec Thomas and taken from
 # http://stackoverflow.com/questions/36932/how-can-i-represent-an-enum-in-python
@@ -45,6 +45,186 @@ netsnmpAgentStatus = enum(
 	"RECONNECTING",     # Got disconnected, trying to reconnect
 )
 
+# Module-level binding for the per-cell table API function, saving the
+# attribute lookups on the library handle for every setRowCell() call
+_netsnmp_set_row_column = libnsX.netsnmp_set_row_column
+
+# Likewise for the function adding a new table row's index values
+_snmp_varlist_add_variable = libnsa.snmp_varlist_add_variable
+
+# array module typecode matching the size of net-snmp's "oid" type
+_OID_TYPECODE = "L" if ctypes.sizeof(c_oid) == ctypes.sizeof(ctypes.c_ulong) else "I"
+
+# Helper function to turn one of net-snmp's linked lists, given by a pointer
+# to its head element, into a Python list of pointers to its elements.
+def _ll_to_list(head):
+	p = head
+	elems = []
+	while bool(p):
+		elems.append(p)
+		p = p.contents.next
+	return elems
+
+# Textual descriptions of the ASN types that may occur in table columns, as
+# returned by Table.value()
+_ASN_NAMES = {
+	ASN_INTEGER:    "Integer",
+	ASN_OCTET_STR:  "OctetString",
+	ASN_IPADDRESS:  "IPAddress",
+	ASN_COUNTER:    "Counter32",
+	ASN_COUNTER64:  "Counter64",
+	ASN_UNSIGNED:   "Unsigned32",
+	ASN_TIMETICKS:  "TimeTicks"
+}
+
+# ASN types whose values are represented by a single OID sub-identifier when
+# used as table index and are shown as plain numbers by snmptable. This
+# excludes ASN_INTEGER: INTEGER syntaxes may define enumerations, in which
+# case the index is shown by its label instead.
+_NUMERIC_ASN_TYPES = (ASN_UNSIGNED, ASN_COUNTER, ASN_TIMETICKS)
+
+# Handler modes for read-only and writable registrations, indexed by the
+# "writable" flag
+_HANDLER_MODES = (HANDLER_CAN_RONLY, HANDLER_CAN_RWRITE)
+
+# Helper functions to extract the value of a netsnmp_table_data_set_storage
+# structure, dispatched by ASN type via _TABLE_EXTRACTORS. Types not listed
+# there are stored as integers.
+def _extract_integer(storage):
+	return storage.data.integer.contents.value
+
+def _extract_octet_str(storage):
+	return u(ctypes.string_at(storage.data.voidp, storage.data_len))
+
+def _extract_counter64(storage):
+	return storage.data.counter64.contents.value
+
+def _extract_ipaddress(storage):
+	return netsnmpvartypes._ipv4(storage.data.ipaddr.contents.value)
+
+_TABLE_EXTRACTORS = {
+	ASN_OCTET_STR:  _extract_octet_str,
+	ASN_COUNTER64:  _extract_counter64,
+	ASN_IPADDRESS:  _extract_ipaddress
+}
+
+# Adds the value of a new table row's index, given as VarType object, to the
+# row's index varlist
+def _add_index(indexes_p, idxobj):
+	# A NULL pointer result is a false pointer object, it never compares
+	# equal to None
+	if not _snmp_varlist_add_variable(
+		indexes_p,
+		None,
+		0,
+		idxobj._asntype,
+		idxobj.cref_as_index(),
+		idxobj._data_size
+	):
+		raise netsnmpAgentException("snmp_varlist_add_variable() failed!")
+
+def _add_single_index(indexes_p, idxobjs):
+	_add_index(indexes_p, idxobjs[0])
+
+def _add_all_indexes(indexes_p, idxobjs):
+	for idxobj in idxobjs:
+		_add_index(indexes_p, idxobj)
+
+# Functions adding the index values of a new table row, given as a list of
+# VarType objects, by number of indexes. Most tables have a single index
+# only, so for these we avoid the loop altogether. Tables with more indexes
+# use _add_all_indexes().
+_INDEX_ADDERS = {
+	1: _add_single_index
+}
+
+# Returns the function that adds the index values of a new table row for a
+# table with the given number of indexes
+def _make_index_adder(idxcount):
+	return _INDEX_ADDERS.get(idxcount, _add_all_indexes)
+
+# Textual descriptions of net-snmp's log priority levels
+_LOG_PRIORITIES = {
+	LOG_EMERG: "Emergency",
+	LOG_ALERT: "Alert",
+	LOG_CRIT: "Critical",
+	LOG_ERR: "Error",
+	LOG_WARNING: "Warning",
+	LOG_NOTICE: "Notice",
+	LOG_INFO: "Info",
+	LOG_DEBUG: "Debug"
+}
+
+# Regular expressions used by our custom net-snmp log handler
+_RE_LOG_PREFIX          = re.compile("^(Warning|Error): *")
+_RE_LOG_CONNECTFAILED   = re.compile("Failed to .* the agentx master agent.*")
+_RE_LOG_CONNECTED       = re.compile("AgentX subagent connected")
+_RE_LOG_DISCONNECTED    = re.compile("AgentX master disconnected us.*")
+
+# Decorator caching the results of a single-argument function. Python 2.x's
+# functools has no lru_cache(), there we use a plain, unbounded dictionary.
+try:
+	# Python 3.x
+	_cached = functools.lru_cache(maxsize = 4096)
+except AttributeError:
+	# Python 2.x
+	def _cached(func):
+		cache = {}
+		@functools.wraps(func)
+		def wrapper(arg):
+			try:
+				return cache[arg]
+			except KeyError:
+				result = cache[arg] = func(arg)
+				return result
+		return wrapper
+
+# Translates an OID string into net-snmp's internal OID representation using
+# the MIBs loaded, returned as a c_oid array of the exact length. Registering
+# the same OID again (eg. in another context) is answered from the cache.
+# Failed translations raise an exception and are thus not cached, so they
+# will be retried eg. after further MIBs have been loaded.
+@_cached
+def _read_objid(oidstr):
+	# We can't know the length of the internal OID representation
+	# beforehand, so we use the thread's MAX_OID_LEN sized scratch buffer for
+	# the call to read_objid() and copy the result.
+	(oid, oid_len) = get_oid_scratch()
+
+	# Let libsnmpagent parse the OID. ctypes passes the c_oid array as
+	# c_oid_p and the c_size_t by reference as declared in read_objid()'s
+	# argtypes, so no explicit cast()/byref() is needed.
+	if libnsa.read_objid(b(oidstr), oid, oid_len) == 0:
+		raise netsnmpAgentException("read_objid({0}) failed!".format(oidstr))
+
+	result = (c_oid * oid_len.value)()
+	ctypes.memmove(result, oid, ctypes.sizeof(result))
+	return result
+
+# Returns the default for the "initval" argument of a VarType class's
+# __init__ method
+def _initval_default(cls):
+	try:
+		# Python 3.x
+		return inspect.signature(cls.__init__).parameters["initval"].default
+	except AttributeError:
+		# Python 2.x has no inspect.signature()
+		spec = inspect.getargspec(cls.__init__)
+		return spec.defaults[spec.args.index("initval") - len(spec.args)]
+
+# The non-private VarType-inheriting classes in the netsnmpvartypes module
+# along with their defaults for "initval", as parsed from the argument
+# specification of their __init__ methods. These do not change, so we
+# determine them once instead of for every netsnmpAgent instance.
+_VARTYPE_CLASSES = [
+	(m[1], _initval_default(m[1]))
+	for m
+	in inspect.getmembers(netsnmpvartypes)
+	if not m[0].startswith("_")
+	and inspect.isclass(m[1])
+	and issubclass(m[1], netsnmpvartypes._VarType)
+]
+
 class netsnmpAgent(object):
 	""" Implements an SNMP agent using the net-snmp libraries. """
 
@@ -68,7 +248,11 @@ class netsnmpAgent(object):
 		                  the OIDs, for which variables will be registered, do
 		                  not belong to standard MIBs and the custom MIBs are not
 		                  located in net-snmp's default MIB path
-		                  (/usr/share/snmp/mibs).
+		                  (/usr/share/snmp/mibs). The MIBs are loaded when the
+		                  first SNMP object gets registered or, at the latest,
+		                  by start(). A MIB file that can not be loaded thus
+		                  raises a netsnmpAgentException there, not when
+		                  instantiating netsnmpAgent.
 		- UseMIBFiles   : Whether to use MIB files at all or not. When False,
 		                  the parser for MIB files will not be initialized, so
 		                  neither system-wide MIB files nor the ones provided
@@ -99,9 +283,15 @@ class netsnmpAgent(object):
 		}
 		for key in defaults:
 			setattr(self, key, args.get(key, defaults[key]))
-		if self.UseMIBFiles and self.MIBFiles is not None and type(self.MIBFiles) not in (list, tuple):
+		if self.UseMIBFiles and self.MIBFiles is not None and not isinstance(self.MIBFiles, (list, tuple)):
 			self.MIBFiles = (self.MIBFiles,)
 
+		# Byte-encoded versions of settings passed to the net-snmp C API,
+		# encoded and wrapped as ctypes objects once instead of on every use
+		self._agent_name_b  = ctypes.c_char_p(b(self.AgentName))
+		self._master_sock_b = ctypes.c_char_p(b(self.MasterSocket)) \
+		                      if self.MasterSocket else None
+
 		# Initialize status attribute -- until start() is called we will accept
 		# SNMP object registrations
 		self._status = netsnmpAgentStatus.REGISTRATION
@@ -133,25 +323,12 @@ class netsnmpAgent(object):
 			# net-snmp's log_handler_callback() in snmplib/snmp_logging.c) while
 			# "clientarg" will be None (see the registration code below).
 			logmsg = ctypes.cast(serverarg, snmp_log_message_p)
-
-			# Generate textual description of priority level
-			priorities = {
-				LOG_EMERG: "Emergency",
-				LOG_ALERT: "Alert",
-				LOG_CRIT: "Critical",
-				LOG_ERR: "Error",
-				LOG_WARNING: "Warning",
-				LOG_NOTICE: "Notice",
-				LOG_INFO: "Info",
-				LOG_DEBUG: "Debug"
-			}
-			msgprio = priorities[logmsg.contents.priority]
+			msgprioid = logmsg.contents.priority
 
 			# Strip trailing linefeeds and in addition "Warning: " and "Error: "
 			# from msgtext as these conditions are already indicated through
-			# msgprio
-			msgtext = re.sub(
-				"^(Warning|Error): *",
+			# the priority level
+			msgtext = _RE_LOG_PREFIX.sub(
 				"",
 				u(logmsg.contents.msg.rstrip(b"\n"))
 			)
@@ -161,9 +338,8 @@ class netsnmpAgent(object):
 			# really an ugly hack, introducing a dependency on the particular
 			# text of log messages -- hopefully the net-snmp guys won't
 			# translate them one day.
-			if  msgprio == "Warning" \
-			or  msgprio == "Error" \
-			and re.match("Failed to .* the agentx master agent.*", msgtext):
+			if  msgprioid in (LOG_WARNING, LOG_ERR) \
+			and _RE_LOG_CONNECTFAILED.match(msgtext):
 				# If this was the first connection attempt, we consider the
 				# condition fatal: it is more likely that an invalid
 				# "MasterSocket" was specified than that we've got concurrency
@@ -179,21 +355,24 @@ class netsnmpAgent(object):
 				# Otherwise we'll stay at status RECONNECTING and log net-snmp's
 				# message like any other. net-snmp code will keep retrying to
 				# connect.
-			elif msgprio == "Info" \
-			and  re.match("AgentX subagent connected", msgtext):
+			elif msgprioid == LOG_INFO \
+			and  _RE_LOG_CONNECTED.match(msgtext):
 				self._status = netsnmpAgentStatus.CONNECTED
-			elif msgprio == "Info" \
-			and  re.match("AgentX master disconnected us.*", msgtext):
+			elif msgprioid == LOG_INFO \
+			and  _RE_LOG_DISCONNECTED.match(msgtext):
 				self._status = netsnmpAgentStatus.RECONNECTING
 
+			# Generate textual description of priority level
+			msgprio = _LOG_PRIORITIES[msgprioid]
+
 			# If "LogHandler" was defined, call it to take care of logging.
-			# Otherwise print all log messages to stderr to resemble net-snmp
+			# Otherwise write all log messages to stderr to resemble net-snmp
 			# standard behavior (but add log message's associated priority in
 			# plain text as well)
 			if self.LogHandler:
 				self.LogHandler(msgprio, msgtext)
 			else:
-				print("[{0}] {1}".format(msgprio, msgtext))
+				sys.stderr.write("[{0}] {1}\n".format(msgprio, msgtext))
 
 			return 0
 
@@ -274,11 +453,11 @@ class netsnmpAgent(object):
 		# Use an alternative transport specification to connect to the master?
 		# Defaults to "/var/run/agentx/master".
 		# (See the "LISTENING ADDRESSES" section in the snmpd(8) manpage)
-		if self.MasterSocket:
+		if self._master_sock_b:
 			if libnsa.netsnmp_ds_set_string(
 				NETSNMP_DS_APPLICATION_ID,
 				NETSNMP_DS_AGENT_X_SOCKET,
-				b(self.MasterSocket)
+				self._master_sock_b
 			) != SNMPERR_SUCCESS:
 				raise netsnmpAgentException(
 					"netsnmp_ds_set_string() failed for NETSNMP_DS_AGENT_X_SOCKET!"
@@ -295,48 +474,75 @@ class netsnmpAgent(object):
 					"netsnmp_ds_set_string() failed for NETSNMP_DS_LIB_PERSISTENT_DIR!"
 				)
 
+		# check_and_process() is typically called in a tight loop, so save
+		# the module attribute lookups there
+		self._agent_check_and_process = libnsa.agent_check_and_process
+
 		# Initialize net-snmp library (see netsnmp_agent_api(3))
-		if libnsa.init_agent(b(self.AgentName)) != 0:
+		if libnsa.init_agent(self._agent_name_b) != 0:
 			raise netsnmpAgentException("init_agent() failed!")
 
-		# Initialize MIB parser
-		if self.UseMIBFiles:
-			libnsa.netsnmp_init_mib()
+		# Initializing the MIB parser and reading MIB files can take a while,
+		# so we defer it until an OID actually needs to be translated or the
+		# agent gets started (see _ensure_mibs_loaded()). Should reading a
+		# MIB file fail, we remember the exception.
+		self._mibs_loaded = False
+		self._mibs_error  = None
 
-		# If MIBFiles were specified (ie. MIBs that can not be found in
-		# net-snmp's default MIB directory /usr/share/snmp/mibs), read
-		# them in so we can translate OID strings to net-snmp's internal OID
-		# format.
-		if self.UseMIBFiles and self.MIBFiles:
-			for mib in self.MIBFiles:
-				if libnsa.read_mib(b(mib)) == 0:
-					raise netsnmpAgentException("netsnmp_read_module({0}) " +
-					                            "failed!".format(mib))
+		# Cache of byte-encoded context names. Besides saving re-encoding the
+		# same context for every registered SNMP object, this also keeps the
+		# byte strings alive that net-snmp's handler registrations point to.
+		self._ctx_cache = {}
 
-		# Initialize our SNMP object registry
-		self._objs = defaultdict(dict)
+		# Cache of already parsed OID prefixes for registrations without MIB
+		# files, mapping prefix strings to packed arrays of OID components
+		self._oid_prefixes = {}
+
+		# Initialize our SNMP object registry. For each context, it stores
+		# the registered OIDs, type names and SNMP objects in parallel lists,
+		# plus an index mapping OIDs to list positions (see _registerObj()).
+		self._objs = {}
 
 		# For each non-private VarType-inheriting class in the netsnmpvartypes
 		# module we dynamically define a class wrapper method in our
 		# netsnmpAgent class which, besides instantiation, sets up a Net-SNMP
 		# watcher for the instance and registers it within our object registry.
-		for vartype_cls in [
-			m[1]
-			for m
-			in inspect.getmembers(sys.modules["netsnmpvartypes"])
-			if not m[0].startswith("_")
-			and inspect.isclass(m[1])
-			and issubclass(m[1], netsnmpvartypes._VarType)
-		]:
-			# Parse the argument specification for the class's __init__ method
-			# to get its default for "initval"
-			default_initval = inspect.signature(vartype_cls.__init__).parameters["initval"].default
-
+		for (vartype_cls, default_initval) in _VARTYPE_CLASSES:
 			# Make class wrapper method available in our netsnmpAgent
 			# module under the name of the VarType class
 			cls_wrapper = self._generateVarTypeClassWrapper(vartype_cls, default_initval)
 			setattr(self, vartype_cls.__name__, cls_wrapper)
 
+	def _ensure_mibs_loaded(self):
+		if self._mibs_loaded or not self.UseMIBFiles:
+			return
+
+		# Reading the MIB files already failed before. Instead of
+		# initializing the MIB parser and re-reading the MIB files that did
+		# load again, raise the same exception once more.
+		if self._mibs_error:
+			raise self._mibs_error
+
+		# Initialize MIB parser
+		libnsa.netsnmp_init_mib()
+
+		# If MIBFiles were specified (ie. MIBs that can not be found in
+		# net-snmp's default MIB directory /usr/share/snmp/mibs), read
+		# them in so we can translate OID strings to net-snmp's internal OID
+		# format.
+		if self.MIBFiles:
+			read_mib = libnsa.read_mib
+			for mib in self.MIBFiles:
+				# read_mib() returns a NULL tree pointer on failure, which
+				# ctypes represents as a false pointer object, not as 0
+				if not read_mib(b(mib)):
+					self._mibs_error = netsnmpAgentException(
+						"netsnmp_read_module({0}) failed!".format(mib)
+					)
+					raise self._mibs_error
+
+		self._mibs_loaded = True
+
 	def _generateVarTypeClassWrapper(self, vartype_cls, default_initval):
 		def _cls_wrapper(initval = default_initval, oidstr = None, writable = True, context = ""):
 			# Get instance of VarType-inheriting class
@@ -347,7 +553,7 @@ class netsnmpAgent(object):
 			if oidstr:
 				# Prepare the netsnmp_handler_registration structure.
 				handler_reginfo = self._prepareRegistration(oidstr, writable)
-				handler_reginfo.contents.contextName = b(context)
+				handler_reginfo.contents.contextName = self._ctx(context)
 
 				# Create the netsnmp_watcher_info structure.
 				cls_inst._watcher = libnsX.netsnmp_create_watcher_info(
@@ -373,7 +579,7 @@ class netsnmpAgent(object):
 
 				# Finally, we keep track of all registered SNMP objects for the
 				# getRegistered() method.
-				self._objs[context][oidstr] = cls_inst
+				self._registerObj(context, oidstr, cls_inst)
 
 			return cls_inst
 
@@ -382,6 +588,33 @@ class netsnmpAgent(object):
 
 		return _cls_wrapper
 
+	def _ctx(self, context):
+		# Return the byte-encoded form of "context", encoding it only once
+		ctx = self._ctx_cache.get(context)
+		if ctx is None:
+			ctx = self._ctx_cache[context] = b(context)
+		return ctx
+
+	def _registerObj(self, context, oidstr, snmpobj):
+		# Add "snmpobj" to our registry of SNMP objects
+		ctxobjs = self._objs.get(context)
+		if ctxobjs is None:
+			ctxobjs = self._objs[context] = {
+				"oids":  [],
+				"types": [],
+				"objs":  [],
+				"idx":   {}
+			}
+		idx = ctxobjs["idx"].get(oidstr)
+		if idx is None:
+			ctxobjs["idx"][oidstr] = len(ctxobjs["oids"])
+			ctxobjs["oids"].append(oidstr)
+			ctxobjs["types"].append(type(snmpobj).__name__)
+			ctxobjs["objs"].append(snmpobj)
+		else:
+			ctxobjs["types"][idx] = type(snmpobj).__name__
+			ctxobjs["objs"][idx]  = snmpobj
+
 	def _prepareRegistration(self, oidstr, writable = True):
 		# Make sure the agent has not been start()ed yet
 		if self._status != netsnmpAgentStatus.REGISTRATION:
@@ -389,33 +622,36 @@ class netsnmpAgent(object):
 			                            "after agent has been started!")
 
 		if self.UseMIBFiles:
-			# We can't know the length of the internal OID representation
-			# beforehand, so we use a MAX_OID_LEN sized buffer for the call to
-			# read_objid() below
-			oid = (c_oid * MAX_OID_LEN)()
-			oid_len = ctypes.c_size_t(MAX_OID_LEN)
-
-			# Let libsnmpagent parse the OID
-			if libnsa.read_objid(
-				b(oidstr),
-				ctypes.cast(ctypes.byref(oid), c_oid_p),
-				ctypes.byref(oid_len)
-			) == 0:
-				raise netsnmpAgentException("read_objid({0}) failed!".format(oidstr))
+			self._ensure_mibs_loaded()
+
+			# net-snmp copies the OID when creating the handler registration,
+			# so it's safe to pass the cached array
+			oid = _read_objid(oidstr)
+			oid_len = len(oid)
 		else:
-			# Interpret the given oidstr as the oid itself.
+			# Interpret the given oidstr as the oid itself. Most OIDs
+			# registered share the same prefix, so we parse each distinct
+			# prefix only once and convert the last component only.
+			(prefix, sep, last) = oidstr.rpartition(".")
 			try:
-				parts = [c_oid(long(x) if sys.version_info <= (3,) else int(x)) for x in oidstr.split('.')]
-			except ValueError:
+				prefix_parts = self._oid_prefixes.get(prefix)
+				if prefix_parts is None:
+					prefix_parts = array.array(
+						_OID_TYPECODE,
+						[int(x) for x in prefix.split(".")] if sep else []
+					)
+					self._oid_prefixes[prefix] = prefix_parts
+				parts = array.array(_OID_TYPECODE, prefix_parts)
+				parts.append(int(last))
+			except (ValueError, OverflowError):
 				raise netsnmpAgentException("Invalid OID (not using MIB): {0}".format(oidstr))
 
-			oid = (c_oid * len(parts))(*parts)
+			# Let the ctypes array share the packed array's buffer instead of
+			# constructing a c_oid object per component. from_buffer() keeps
+			# a reference to "parts", so it stays alive as long as "oid".
+			oid = (c_oid * len(parts)).from_buffer(parts)
 			oid_len = ctypes.c_size_t(len(parts))
 
-		# Do we allow SNMP SETting to this OID?
-		handler_modes = HANDLER_CAN_RWRITE if writable \
-		                                   else HANDLER_CAN_RONLY
-
 		# Create the netsnmp_handler_registration structure. It notifies
 		# net-snmp that we will be responsible for anything below the given
 		# OID. We use this for leaf nodes only, processing of subtrees will be
@@ -425,297 +661,45 @@ class netsnmpAgent(object):
 			None,
 			oid,
 			oid_len,
-			handler_modes
+			# Do we allow SNMP SETting to this OID?
+			_HANDLER_MODES[bool(writable)]
 		)
 
 		return handler_reginfo
 
 	def Table(self, oidstr, indexes, columns, counterobj = None, extendable = False, context = ""):
-		agent = self
-
-		# Define a Python class to provide access to the table.
-		class Table(object):
-			def __init__(self, oidstr, idxobjs, coldefs, counterobj, extendable, context):
-				# Create a netsnmp_table_data_set structure, representing both
-				# the table definition and the data stored inside it. We use the
-				# oidstr as table name.
-				self._dataset = libnsX.netsnmp_create_table_data_set(
-					ctypes.c_char_p(b(oidstr))
-				)
-
-				# Define the table row's indexes
-				for idxobj in idxobjs:
-					libnsX.netsnmp_table_dataset_add_index(
-						self._dataset,
-						idxobj._asntype
-					)
-
-				# Define the table's columns and their default values
-				for coldef in coldefs:
-					colno    = coldef[0]
-					defobj   = coldef[1]
-					writable = coldef[2] if len(coldef) > 2 \
-					                     else 0
-
-					result = libnsX.netsnmp_table_set_add_default_row(
-						self._dataset,
-						colno,
-						defobj._asntype,
-						writable,
-						defobj.cref(),
-						defobj._data_size
-					)
-					if result != SNMPERR_SUCCESS:
-						raise netsnmpAgentException(
-							"netsnmp_table_set_add_default_row() failed with "
-							"error code {0}!".format(result)
-						)
-
-				# Register handler and table_data_set with net-snmp.
-				self._handler_reginfo = agent._prepareRegistration(
-					oidstr,
-					extendable
-				)
-				self._handler_reginfo.contents.contextName = b(context)
-				result = libnsX.netsnmp_register_table_data_set(
-					self._handler_reginfo,
-					self._dataset,
-					None
-				)
-				if result != SNMP_ERR_NOERROR:
-					raise netsnmpAgentException(
-						"Error code {0} while registering table with "
-						"net-snmp!".format(result)
-					)
-
-				# Finally, we keep track of all registered SNMP objects for the
-				# getRegistered() method.
-				agent._objs[context][oidstr] = self
-
-				# If "counterobj" was specified, use it to track the number
-				# of table rows
-				if counterobj:
-					counterobj.update(0)
-				self._counterobj = counterobj
-
-			def addRow(self, idxobjs):
-				dataset = self._dataset
-
-				# Define a Python class to provide access to the table row.
-				class TableRow(object):
-					def __init__(self, idxobjs):
-						# Create the netsnmp_table_set_storage structure for
-						# this row.
-						self._table_row = libnsX.netsnmp_table_data_set_create_row_from_defaults(
-							dataset.contents.default_row
-						)
-
-						# Add the indexes
-						for idxobj in idxobjs:
-							result = libnsa.snmp_varlist_add_variable(
-								ctypes.pointer(self._table_row.contents.indexes),
-								None,
-								0,
-								idxobj._asntype,
-								idxobj.cref(is_table_index=True),
-								idxobj._data_size
-							)
-							if result == None:
-								raise netsnmpAgentException("snmp_varlist_add_variable() failed!")
-
-					def setRowCell(self, column, snmpobj):
-						result = libnsX.netsnmp_set_row_column(
-							self._table_row,
-							column,
-							snmpobj._asntype,
-							snmpobj.cref(),
-							snmpobj._data_size
-						)
-						if result != SNMPERR_SUCCESS:
-							raise netsnmpAgentException("netsnmp_set_row_column() failed with error code {0}!".format(result))
-
-				row = TableRow(idxobjs)
-
-				libnsX.netsnmp_table_dataset_add_row(
-					dataset,        # *table
-					row._table_row  # row
-				)
-
-				if self._counterobj:
-					self._counterobj.update(self._counterobj.value() + 1)
-
-				return row
-
-			def value(self):
-				# Because tables are more complex than scalar variables, we
-				# return a dictionary representing the table's structure and
-				# contents instead of a simple string.
-				retdict = {}
-
-				# The first entry will contain the defined columns, their types
-				# and their defaults, if set. We use array index 0 since it's
-				# impossible for SNMP tables to have a row with that index.
-				retdict[0] = {}
-				col = self._dataset.contents.default_row
-				while bool(col):
-					retdict[0][int(col.contents.column)] = {}
-
-					asntypes = {
-						ASN_INTEGER:    "Integer",
-						ASN_OCTET_STR:  "OctetString",
-						ASN_IPADDRESS:  "IPAddress",
-						ASN_COUNTER:    "Counter32",
-						ASN_COUNTER64:  "Counter64",
-						ASN_UNSIGNED:   "Unsigned32",
-						ASN_TIMETICKS:  "TimeTicks"
-					}
-					retdict[0][int(col.contents.column)]["type"] = asntypes[col.contents.type]
-					if bool(col.contents.data):
-						if col.contents.type == ASN_OCTET_STR:
-							retdict[0][int(col.contents.column)]["value"] = u(ctypes.string_at(col.contents.data.string, col.contents.data_len))
-						elif col.contents.type == ASN_IPADDRESS:
-							uint_value = ctypes.cast(
-								(ctypes.c_int*1)(col.contents.data.integer.contents.value),
-								ctypes.POINTER(ctypes.c_uint)
-							).contents.value
-							retdict[0][int(col.contents.column)]["value"] = socket.inet_ntoa(struct.pack("I", uint_value))
-						else:
-							retdict[0][int(col.contents.column)]["value"] = col.contents.data.integer.contents.value
-					col = col.contents.next
-
-				# Next we iterate over the table's rows, creating a dictionary
-				# entry for each row after that row's index.
-				row = self._dataset.contents.table.contents.first_row
-				while bool(row):
-					# We want to return the row index in the same way it is
-					# shown when using "snmptable", eg. "aa" instead of 2.97.97.
-					# This conversion is actually quite complicated (see
-					# net-snmp's sprint_realloc_objid() in snmplib/mib.c and
-					# get*_table_entries() in apps/snmptable.c for details).
-					# All code below assumes eg. that the OID output format was
-					# not changed.
-					
-					# snprint_objid() below requires a _full_ OID whereas the
-					# table row contains only the current row's identifer.
-					# Unfortunately, net-snmp does not have a ready function to
-					# get the full OID. The following code was modelled after
-					# similar code in netsnmp_table_data_build_result().
-					fulloid = ctypes.cast(
-						ctypes.create_string_buffer(
-							MAX_OID_LEN * ctypes.sizeof(c_oid)
-						),
-						c_oid_p
-					)
-
-					# Registered OID
-					rootoidlen = self._handler_reginfo.contents.rootoid_len
-					for i in range(0, rootoidlen):
-						fulloid[i] = self._handler_reginfo.contents.rootoid[i]
-
-					# Entry
-					fulloid[rootoidlen] = 1
-
-					# Fake the column number. Unlike the table_data and
-					# table_data_set handlers, we do not have one here. No
-					# biggie, using a fixed value will do for our purposes as
-					# we'll do away with anything left of the first dot below.
-					fulloid[rootoidlen + 1] = 2
-
-					# Index data
-					indexoidlen = row.contents.index_oid_len
-					for i in range(0, indexoidlen):
-						fulloid[rootoidlen + 2 + i] = row.contents.index_oid[i]
-
-					# Convert the full OID to its string representation
-					oidcstr = ctypes.create_string_buffer(MAX_OID_LEN)
-					libnsa.snprint_objid(
-						oidcstr,
-						MAX_OID_LEN,
-						fulloid,
-						rootoidlen + 2 + indexoidlen
-					)
-
-					# And finally do away with anything left of the first dot
-					# so we keep the row index only
-					indices = oidcstr.value.split(b".", 1)[1]
-
-					# If it's a string, remove the double quotes. If it's a
-					# string containing an integer, make it one
-					try:
-						indices = int(indices)
-					except ValueError:
-						indices = u(indices.replace(b'"', b''))
-
-					# Finally, iterate over all columns for this row and add
-					# stored data, if present
-					retdict[indices] = {}
-					data = ctypes.cast(row.contents.data, ctypes.POINTER(netsnmp_table_data_set_storage))
-					while bool(data):
-						if bool(data.contents.data):
-							if data.contents.type == ASN_OCTET_STR:
-								retdict[indices][int(data.contents.column)] = u(ctypes.string_at(data.contents.data.string, data.contents.data_len))
-							elif data.contents.type == ASN_COUNTER64:
-								retdict[indices][int(data.contents.column)] = data.contents.data.counter64.contents.value
-							elif data.contents.type == ASN_IPADDRESS:
-								uint_value = ctypes.cast((ctypes.c_int*1)(
-									data.contents.data.integer.contents.value),
-									ctypes.POINTER(ctypes.c_uint)
-									).contents.value
-								retdict[indices][int(data.contents.column)] = socket.inet_ntoa(struct.pack("I", uint_value))
-							else:
-								retdict[indices][int(data.contents.column)] = data.contents.data.integer.contents.value
-						else:
-							retdict[indices] += {}
-						data = data.contents.next
-
-					row = row.contents.next
-
-				return retdict
-
-			def clear(self):
-				table = self._dataset.contents.table.contents
-				while table.first_row:
-					libnsX.netsnmp_table_dataset_remove_and_delete_row(
-						self._dataset,
-						table.first_row
-					)
-				if self._counterobj:
-					self._counterobj.update(0)
-
-		# Return an instance of the just-defined class to the agent
-		return Table(oidstr, indexes, columns, counterobj, extendable, context)
+		return Table(self, oidstr, indexes, columns, counterobj, extendable, context)
 
 	def getContexts(self):
 		""" Returns the defined contexts. """
 
-		return self._objs.keys()
+		return list(self._objs.keys())
 
 	def getRegistered(self, context = ""):
 		""" Returns a dictionary with the currently registered SNMP objects.
 
 		    Returned is a dictionary objects for the specified "context",
 		    which defaults to the default context. """
-		myobjs = {}
-		try:
-			# Python 2.x
-			objs_iterator = self._objs[context].iteritems()
-		except AttributeError:
-			# Python 3.x
-			objs_iterator = self._objs[context].items()
-		for oidstr, snmpobj in objs_iterator:
-			myobjs[oidstr] = {
-				"type": type(snmpobj).__name__,
+		ctxobjs = self._objs.get(context)
+		if ctxobjs is None:
+			return {}
+		return {
+			oidstr: {
+				"type": typename,
 				"value": snmpobj.value()
 			}
-		return dict(myobjs)
+			for oidstr, typename, snmpobj
+			in zip(ctxobjs["oids"], ctxobjs["types"], ctxobjs["objs"])
+		}
 
 	def start(self):
 		""" Starts the agent. Among other things, this means connecting
 		    to the master agent, if configured that way. """
 		if  self._status != netsnmpAgentStatus.CONNECTED \
 		and self._status != netsnmpAgentStatus.RECONNECTING:
+			self._ensure_mibs_loaded()
 			self._status = netsnmpAgentStatus.FIRSTCONNECT
-			libnsa.init_snmp(b(self.AgentName))
+			libnsa.init_snmp(self._agent_name_b)
 			if self._status == netsnmpAgentStatus.CONNECTFAILED:
 				msg = "Error connecting to snmpd instance at \"{0}\" -- " \
 				      "incorrect \"MasterSocket\" or snmpd not running?"
@@ -725,11 +709,14 @@ class netsnmpAgent(object):
 	def check_and_process(self, block=True):
 		""" Processes incoming SNMP requests.
 		    If optional "block" argument is True (default), the function
-		    will block until a SNMP packet is received. """
-		return libnsa.agent_check_and_process(int(bool(block)))
+		    will block until a SNMP packet is received. The net-snmp
+		    libraries are loaded through ctypes.cdll, which releases the
+		    GIL for the duration of the call, so other Python threads keep
+		    running while this function blocks. """
+		return self._agent_check_and_process(int(bool(block)))
 
 	def shutdown(self):
-		libnsa.snmp_shutdown(b(self.AgentName))
+		libnsa.snmp_shutdown(self._agent_name_b)
 
 		# Unfortunately we can't safely call shutdown_agent() for the time
 		# being. All net-snmp versions up to and including 5.7.3 are unable
@@ -737,5 +724,243 @@ class netsnmpAgent(object):
 		# one effectively has to rely on the OS to release resources.
 		#libnsa.shutdown_agent()
 
-class netsnmpAgentException(Exception):
-	pass
+class Table(object):
+	""" Provides access to a table registered with net-snmp. """
+
+	def __init__(self, agent, oidstr, idxobjs, coldefs, counterobj, extendable, context):
+		# Create a netsnmp_table_data_set structure, representing both the
+		# table definition and the data stored inside it. We use the oidstr
+		# as table name.
+		self._dataset = libnsX.netsnmp_create_table_data_set(
+			ctypes.c_char_p(b(oidstr))
+		)
+
+		# Define the table row's indexes and remember their types
+		self._idx_asntypes = tuple(idxobj._asntype for idxobj in idxobjs)
+		self._add_indexes = _make_index_adder(len(idxobjs))
+		for idxobj in idxobjs:
+			libnsX.netsnmp_table_dataset_add_index(
+				self._dataset,
+				idxobj._asntype
+			)
+
+		# Define the table's columns and their default values
+		for coldef in coldefs:
+			colno    = coldef[0]
+			defobj   = coldef[1]
+			writable = coldef[2] if len(coldef) > 2 \
+			                     else 0
+
+			result = libnsX.netsnmp_table_set_add_default_row(
+				self._dataset,
+				colno,
+				defobj._asntype,
+				writable,
+				defobj.cref(),
+				defobj._data_size
+			)
+			if result != SNMPERR_SUCCESS:
+				raise netsnmpAgentException(
+					"netsnmp_table_set_add_default_row() failed with "
+					"error code {0}!".format(result)
+				)
+
+		# Register handler and table_data_set with net-snmp.
+		self._handler_reginfo = agent._prepareRegistration(
+			oidstr,
+			extendable
+		)
+		self._handler_reginfo.contents.contextName = agent._ctx(context)
+		result = libnsX.netsnmp_register_table_data_set(
+			self._handler_reginfo,
+			self._dataset,
+			None
+		)
+		if result != SNMP_ERR_NOERROR:
+			raise netsnmpAgentException(
+				"Error code {0} while registering table with "
+				"net-snmp!".format(result)
+			)
+
+		# Finally, we keep track of all registered SNMP objects for the
+		# getRegistered() method.
+		agent._registerObj(context, oidstr, self)
+
+		# If "counterobj" was specified, use it to track the number of table
+		# rows
+		if counterobj:
+			counterobj.update(0)
+		self._counterobj = counterobj
+
+	def addRow(self, idxobjs):
+		row = TableRow(self._dataset, idxobjs, self._add_indexes)
+
+		libnsX.netsnmp_table_dataset_add_row(
+			self._dataset,  # *table
+			row._table_row  # row
+		)
+
+		if self._counterobj:
+			self._counterobj.update(self._counterobj.value() + 1)
+
+		return row
+
+	def value(self):
+		# Because tables are more complex than scalar variables, we return a
+		# dictionary representing the table's structure and contents instead
+		# of a simple string.
+		retdict = {}
+
+		# The first entry will contain the defined columns, their types
+		# and their defaults, if set. We use array index 0 since it's
+		# impossible for SNMP tables to have a row with that index.
+		retdict[0] = {}
+		for col in _ll_to_list(self._dataset.contents.default_row):
+			ct    = col.contents
+			typ   = ct.type
+			colno = int(ct.column)
+
+			retdict[0][colno] = {}
+			retdict[0][colno]["type"] = _ASN_NAMES[typ]
+			if ct.data.voidp:
+				retdict[0][colno]["value"] = _TABLE_EXTRACTORS.get(typ, _extract_integer)(ct)
+
+		# Next we iterate over the table's rows, creating a dictionary
+		# entry for each row after that row's index.
+		#
+		# We want to return the row index in the same way it is shown when
+		# using "snmptable", eg. "aa" instead of 2.97.97. For a single index
+		# of one of the _NUMERIC_ASN_TYPES, snmptable shows the
+		# sub-identifier verbatim (unless the index object's syntax has a
+		# DISPLAY-HINT, which we ignore), so we can take its value as is.
+		# For indexes consisting of numeric sub-identifiers only, we join
+		# them by dots ourselves. String indexes and INTEGER indexes, which
+		# may be enumerated, require a real conversion, which is actually
+		# quite complicated (see net-snmp's sprint_realloc_objid() in
+		# snmplib/mib.c and get*_table_entries() in apps/snmptable.c for
+		# details), so we let net-snmp's snprint_objid() do it. All code
+		# below assumes eg. that the OID output format was not changed.
+		needs_snprint = any(
+			typ not in _NUMERIC_ASN_TYPES and typ != ASN_IPADDRESS
+			for typ in self._idx_asntypes
+		)
+
+		if needs_snprint:
+			# snprint_objid() requires a _full_ OID whereas the table row
+			# contains only the current row's identifer. Unfortunately,
+			# net-snmp does not have a ready function to get the full OID.
+			# The following code was modelled after similar code in
+			# netsnmp_table_data_build_result(). The part preceding the
+			# index is the same for all rows, so we set it up only once and
+			# reuse the buffers for all rows.
+			fulloid = (c_oid * MAX_OID_LEN)()
+			oidcstr = ctypes.create_string_buffer(MAX_OID_LEN)
+
+			# Registered OID
+			rootoidlen = self._handler_reginfo.contents.rootoid_len
+			ctypes.memmove(
+				fulloid,
+				self._handler_reginfo.contents.rootoid,
+				rootoidlen * ctypes.sizeof(c_oid)
+			)
+
+			# Entry
+			fulloid[rootoidlen] = 1
+
+			# Fake the column number. Unlike the table_data and
+			# table_data_set handlers, we do not have one here. No biggie,
+			# using a fixed value will do for our purposes as we'll do away
+			# with anything left of the first dot below.
+			fulloid[rootoidlen + 1] = 2
+
+			# Offset of the index data inside the full OID
+			indexoidref = ctypes.byref(fulloid, (rootoidlen + 2) * ctypes.sizeof(c_oid))
+
+		for row in _ll_to_list(self._dataset.contents.table.contents.first_row):
+			rt = row.contents
+
+			indexoidlen = rt.index_oid_len
+			if needs_snprint:
+				# Index data
+				ctypes.memmove(
+					indexoidref,
+					rt.index_oid,
+					indexoidlen * ctypes.sizeof(c_oid)
+				)
+
+				# Convert the full OID to its string representation
+				libnsa.snprint_objid(
+					oidcstr,
+					MAX_OID_LEN,
+					fulloid,
+					rootoidlen + 2 + indexoidlen
+				)
+
+				# And finally do away with anything left of the first dot so
+				# we keep the row index only
+				indices = oidcstr.value.split(b".", 1)[1]
+
+				# If it's a string, remove the double quotes. If it's a
+				# string containing an integer, make it one
+				try:
+					indices = int(indices)
+				except ValueError:
+					indices = u(indices.replace(b'"', b''))
+			elif indexoidlen == 1:
+				# A single numeric index sub-identifier is the index itself
+				indices = int(rt.index_oid[0])
+			else:
+				# Join the numeric index sub-identifiers by dots. The result
+				# always contains a dot, so it can never be turned into an
+				# integer and we build the final string directly.
+				indices = ".".join(map(str, rt.index_oid[:indexoidlen]))
+
+			# Finally, iterate over all columns for this row and add
+			# stored data, if present
+			retdict[indices] = {}
+			for data in _ll_to_list(rt.data):
+				dt = data.contents
+				if dt.data.voidp:
+					retdict[indices][int(dt.column)] = _TABLE_EXTRACTORS.get(dt.type, _extract_integer)(dt)
+
+		return retdict
+
+	def clear(self):
+		# net-snmp has no function to delete all rows of a table data set
+		# at once, so we still have to remove them one by one
+		dataset = self._dataset
+		table = dataset.contents.table.contents
+		remove_and_delete_row = libnsX.netsnmp_table_dataset_remove_and_delete_row
+		row = table.first_row
+		while row:
+			remove_and_delete_row(dataset, row)
+			row = table.first_row
+		if self._counterobj:
+			self._counterobj.update(0)
+
+class TableRow(object):
+	""" Provides access to a row of a table registered with net-snmp. """
+
+	def __init__(self, dataset, idxobjs, add_indexes):
+		# Create the netsnmp_table_set_storage structure for this row.
+		self._table_row = libnsX.netsnmp_table_data_set_create_row_from_defaults(
+			dataset.contents.default_row
+		)
+
+		# Add the indexes using the table's index adder function (see
+		# _make_index_adder())
+		add_indexes(
+			ctypes.pointer(self._table_row.contents.indexes),
+			idxobjs
+		)
+
+	def setRowCell(self, column, snmpobj):
+		result = _netsnmp_set_row_column(
+			self._table_row,
+			column,
+			snmpobj._asntype,
+			snmpobj.cref(),
+			snmpobj._data_size
+		)
+		if result != SNMPERR_SUCCESS:
+			raise netsnmpAgentException("netsnmp_set_row_column() failed with error code {0}!".format(result))
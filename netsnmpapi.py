@@ -6,37 +6,59 @@
 # net-snmp C API abstraction module
 #
 
-import ctypes, ctypes.util, locale
+import ctypes, ctypes.util, locale, threading, os
 
 # Helper functions to deal with converting between byte strings (required by
 # ctypes) and Unicode strings (possibly used by the Python version in use)
 #
 # Not really net-snmp stuff but I prefer to avoid introducing yet another
 # Python module for the Python 2/3 compatibility stuff.
-def b(s):
+#
+# The preferred encoding is determined once at import time: b() is called
+# for nearly every string passed to net-snmp and querying the locale each
+# time is comparatively expensive.
+_ENC = locale.getpreferredencoding()
+
+def b(s, _enc = _ENC):
 	""" Encodes Unicode strings to byte strings, if necessary. """
 
-	return s if isinstance(s, bytes) else s.encode(locale.getpreferredencoding())
+	return s if isinstance(s, bytes) else s.encode(_enc)
 
-def u(s):
-	""" Decodes byte strings to Unicode strings, if necessary. """
+if str is bytes:
+	# Python 2.x: byte strings are the native strings, so we leave them alone
+	def u(s, _enc = _ENC):
+		""" Decodes byte strings to Unicode strings, if necessary. """
 
-	return s if isinstance("Test", bytes) else s.decode(locale.getpreferredencoding())
+		return s
+else:
+	# Python 3.x
+	def u(s, _enc = _ENC):
+		""" Decodes byte strings to Unicode strings, if necessary. """
+
+		return s.decode(_enc) if isinstance(s, (bytes, bytearray)) else s
 
 c_sizet_p = ctypes.POINTER(ctypes.c_size_t)
 
 # Make libnetsnmpagent available via Python's ctypes module. We do this globally
 # so we can define C function prototypes
 
+# The libraries' locations can be given explicitly through the
+# NETSNMPAGENT_LIBNETSNMPHELPERS and NETSNMPAGENT_LIBNETSNMPAGENT environment
+# variables. Besides making the libraries used deterministic, this avoids
+# ctypes.util.find_library()'s search, which eg. on Linux runs "ldconfig -p".
+def _find_library(name):
+	return os.environ.get("NETSNMPAGENT_LIB{0}".format(name.upper())) \
+	       or ctypes.util.find_library(name)
+
 # Workaround for net-snmp 5.4.x that has a bug with unresolved dependencies
 # in its libraries (http://sf.net/p/net-snmp/bugs/2107): load netsnmphelpers
 # first
 try:
-	libnsh = ctypes.cdll.LoadLibrary(ctypes.util.find_library("netsnmphelpers"))
+	libnsh = ctypes.cdll.LoadLibrary(_find_library("netsnmphelpers"))
 except:
 	raise Exception("Could not load libnetsnmphelpers! Is net-snmp installed?")
 try:
-	libnsa = ctypes.cdll.LoadLibrary(ctypes.util.find_library("netsnmpagent"))
+	libnsa = ctypes.cdll.LoadLibrary(_find_library("netsnmpagent"))
 except:
 	raise Exception("Could not load libnetsnmpagent! Is net-snmp installed?")
 
@@ -44,11 +66,7 @@ except:
 # to libnetsnmpagent.so in later versions. Use netsnmp_create_watcher_info as
 # a test and define a libnsX handle to abstract from the actually used library
 # version.
-try:
-	libnsa.netsnmp_create_watcher_info
-	libnsX = libnsa
-except AttributeError:
-	libnsX = libnsh
+libnsX = libnsa if hasattr(libnsa, "netsnmp_create_watcher_info") else libnsh
 
 # include/net-snmp/library/callback.h
 
@@ -68,12 +86,12 @@ SNMPCallback = ctypes.CFUNCTYPE(
 )
 
 for f in [ libnsa.snmp_register_callback ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_int,                   # int major
 		ctypes.c_int,                   # int minor
 		SNMPCallback,                   # SNMPCallback *new_callback
 		ctypes.c_void_p                 # void *arg
-	]
+	)
 	f.restype = int
 
 # include/net-snmp/agent/agent_callbacks.h
@@ -105,19 +123,19 @@ NETSNMP_DS_APPLICATION_ID               = 1
 NETSNMP_DS_LIB_PERSISTENT_DIR           = 8
 
 for f in [ libnsa.netsnmp_ds_set_boolean ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_int,                   # int storeid
 		ctypes.c_int,                   # int which
 		ctypes.c_int                    # int value
-	]
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsa.netsnmp_ds_set_string ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_int,                   # int storeid
 		ctypes.c_int,                   # int which
 		ctypes.c_char_p                 # const char *value
-	]
+	)
 	f.restype = ctypes.c_int
 
 # include/net-snmp/agent/ds_agent.h
@@ -128,15 +146,15 @@ NETSNMP_DS_AGENT_X_SOCKET               = 1
 SNMP_ERR_NOERROR                        = 0
 
 for f in [ libnsa.init_snmp ]:
-	f.argtypes = [
-		ctypes.c_char_p                 # const char *type
-	]
+	f.argtypes = (
+		ctypes.c_char_p,                # const char *type
+	)
 	f.restype = None
 
 for f in [ libnsa.snmp_shutdown ]:
-	f.argtypes = [
-		ctypes.c_char_p                 # const char *type
-	]
+	f.argtypes = (
+		ctypes.c_char_p,                # const char *type
+	)
 	f.restype = None
 
 # include/net-snmp/library/oid.h
@@ -146,11 +164,32 @@ c_oid_p = ctypes.POINTER(c_oid)
 # include/net-snmp/types.h
 MAX_OID_LEN                             = 128
 
+# Functions such as read_objid() write an OID of unknown length into a
+# caller-supplied buffer, so callers have to pass a MAX_OID_LEN sized one.
+# Instead of allocating a new buffer for every call, each thread gets its own
+# scratch buffer that is reused.
+_oid_scratch = threading.local()
+
+def get_oid_scratch():
+	""" Returns a (buffer, length) tuple consisting of a MAX_OID_LEN sized
+	    c_oid array and a c_size_t set to MAX_OID_LEN, both private to the
+	    calling thread and reused for subsequent calls. """
+
+	try:
+		scratch = _oid_scratch.scratch
+	except AttributeError:
+		scratch = _oid_scratch.scratch = (
+			(c_oid * MAX_OID_LEN)(),
+			ctypes.c_size_t()
+		)
+	scratch[1].value = MAX_OID_LEN
+	return scratch
+
 # include/net-snmp/agent/snmp_vars.h
 for f in [ libnsa.init_agent ]:
-	f.argtypes = [
-		ctypes.c_char_p                 # const char *app
-	]
+	f.argtypes = (
+		ctypes.c_char_p,                # const char *app
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsa.shutdown_agent ]:
@@ -166,17 +205,17 @@ for f in [ libnsa.netsnmp_init_mib ]:
 	f.restype = None
 
 for f in [ libnsa.read_mib ]:
-	f.argtypes = [
-		ctypes.c_char_p                 # const char *filename
-	]
+	f.argtypes = (
+		ctypes.c_char_p,                # const char *filename
+	)
 	f.restype = ctypes.POINTER(tree)
 
 for f in [ libnsa.read_objid ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_char_p,                # const char *input
 		c_oid_p,                        # oid *output
 		c_sizet_p                       # size_t *out_len
-	]
+	)
 	f.restype = ctypes.c_int
 
 # include/net-snmp/agent/agent_handler.h
@@ -207,13 +246,13 @@ netsnmp_handler_registration._fields_ = [
 ]
 
 for f in [ libnsa.netsnmp_create_handler_registration ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_char_p,                # const char *name
 		ctypes.c_void_p,                # Netsnmp_Node_Handler *handler_access_method
 		c_oid_p,                        # const oid *reg_oid
 		ctypes.c_size_t,                # size_t reg_oid_len
 		ctypes.c_int                    # int modes
-	]
+	)
 	f.restype = netsnmp_handler_registration_p
 
 # include/net-snmp/library/asn1.h
@@ -227,6 +266,8 @@ ASN_OPAQUE_FLOAT                        = ASN_OPAQUE_TAG2 + (ASN_APPLICATION | 8
 # counter64 requires some extra work because it can't be reliably represented
 # by a single C data type
 class counter64(ctypes.Structure):
+	__slots__ = ()
+
 	@property
 	def value(self):
 		return self.high << 32 | self.low
@@ -237,8 +278,7 @@ class counter64(ctypes.Structure):
 		self.low  = val & 0xFFFFFFFF
 
 	def __init__(self, initval=0):
-		ctypes.Structure.__init__(self, 0, 0)
-		self.value = initval
+		ctypes.Structure.__init__(self, initval >> 32, initval & 0xFFFFFFFF)
 counter64_p = ctypes.POINTER(counter64)
 counter64._fields_ = [
 	("high",                ctypes.c_ulong),
@@ -274,26 +314,26 @@ netsnmp_watcher_info._fields_ = [
 ]
 
 for f in [ libnsX.netsnmp_create_watcher_info ]:
-	f.argtypes = [
+	f.argtypes = (
 		ctypes.c_void_p,                # void *data
 		ctypes.c_size_t,                # size_t size
 		ctypes.c_ubyte,                 # u_char type
 		ctypes.c_int                    # int flags
-	]
+	)
 	f.restype = netsnmp_watcher_info_p
 
 for f in [ libnsX.netsnmp_register_watched_instance ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_handler_registration_p, # netsnmp_handler_registration *reginfo
 		netsnmp_watcher_info_p          # netsnmp_watcher_info *winfo
-	]
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsX.netsnmp_register_watched_scalar ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_handler_registration_p, # netsnmp_handler_registration *reginfo
 		netsnmp_watcher_info_p          # netsnmp_watcher_info *winfo
-	]
+	)
 	f.restype = ctypes.c_int
 
 # include/net-snmp/types.h
@@ -303,16 +343,20 @@ netsnmp_variable_list_p_p = ctypes.POINTER(netsnmp_variable_list_p)
 
 # include/net-snmp/varbind_api.h
 for f in [ libnsa.snmp_varlist_add_variable ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_variable_list_p_p,       # netsnmp_variable_list **varlist
 		c_oid_p,                         # const oid *name
 		ctypes.c_size_t,                 # size_t name_length
 		ctypes.c_ubyte,                  # u_char type
 		ctypes.c_void_p,                 # const void *value
 		ctypes.c_size_t                  # size_t len
-	]
+	)
 	f.restype = netsnmp_variable_list_p
 
+# include/net-snmp/agent/table_dataset.h (forward declaration, see below)
+class netsnmp_table_data_set_storage(ctypes.Structure): pass
+netsnmp_table_data_set_storage_p = ctypes.POINTER(netsnmp_table_data_set_storage)
+
 # include/net-snmp/agent/table_data.h
 class netsnmp_table_row(ctypes.Structure): pass
 netsnmp_table_row_p = ctypes.POINTER(netsnmp_table_row)
@@ -320,7 +364,9 @@ netsnmp_table_row._fields_ = [
 	("indexes",             netsnmp_variable_list_p),
 	("index_oid",           c_oid_p),
 	("index_oid_len",       ctypes.c_size_t),
-	("data",                ctypes.c_void_p),
+	# Declared as "void *" but we only use table data sets, which store
+	# a netsnmp_table_data_set_storage list here
+	("data",                netsnmp_table_data_set_storage_p),
 	("next",                netsnmp_table_row_p),
 	("prev",                netsnmp_table_row_p)
 ]
@@ -344,13 +390,15 @@ netsnmp_table_data_set_storage_udata._fields_ = [
 	("string",				ctypes.c_char_p),
 	("objid",				c_oid_p),
 	("bitstring",			ctypes.POINTER(ctypes.c_ubyte)),
-	("counter64",			ctypes.POINTER(counter64)),
+	("counter64",			counter64_p),
 	("floatVal",			ctypes.POINTER(ctypes.c_float)),
-	("doubleVal",			ctypes.POINTER(ctypes.c_double))
+	("doubleVal",			ctypes.POINTER(ctypes.c_double)),
+	# Not part of net-snmp's union: IP addresses are stored as 4 bytes
+	# that would be accessed via "integer", but on LP64 platforms that
+	# would read a long. This alias reads them as unsigned int instead.
+	("ipaddr",				ctypes.POINTER(ctypes.c_uint))
 ]
 
-class netsnmp_table_data_set_storage(ctypes.Structure): pass
-netsnmp_table_data_set_storage_p = ctypes.POINTER(netsnmp_table_data_set_storage)
 netsnmp_table_data_set_storage._fields_ = [
 	("column",              ctypes.c_uint),
 	("writable",            ctypes.c_byte),
@@ -372,69 +420,70 @@ netsnmp_table_data_set._fields_ = [
 ]
 
 for f in [ libnsX.netsnmp_create_table_data_set ]:
-	f.argtypes = [
-		ctypes.c_char_p                 # const char *table_name
-	]
+	f.argtypes = (
+		ctypes.c_char_p,                # const char *table_name
+	)
 	f.restype = netsnmp_table_data_set_p
 
 for f in [ libnsX.netsnmp_table_dataset_add_row ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_table_data_set_p,       # netsnmp_table_data_set *table
 		netsnmp_table_row_p,            # netsnmp_table_row *row
-	]
+	)
 	f.restype = None
 
 for f in [ libnsX.netsnmp_table_data_set_create_row_from_defaults ]:
-	f.argtypes = [
-		netsnmp_table_data_set_storage_p # netsnmp_table_data_set_storage *defrow
-	]
+	f.argtypes = (
+		netsnmp_table_data_set_storage_p, # netsnmp_table_data_set_storage *defrow
+	)
 	f.restype = netsnmp_table_row_p
 
 for f in [ libnsX.netsnmp_table_set_add_default_row ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_table_data_set_p,       # netsnmp_table_data_set *table_set
 		ctypes.c_uint,                  # unsigned int column
 		ctypes.c_int,                   # int type
 		ctypes.c_int,                   # int writable
 		ctypes.c_void_p,                # void *default_value
 		ctypes.c_size_t                 # size_t default_value_len
-	]
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsX.netsnmp_register_table_data_set ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_handler_registration_p, # netsnmp_handler_registration *reginfo
 		netsnmp_table_data_set_p,       # netsnmp_table_data_set *data_set
 		ctypes.c_void_p                 # netsnmp_table_registration_info *table_info
-	]
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsX.netsnmp_set_row_column ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_table_row_p,            # netsnmp_table_row *row
 		ctypes.c_uint,                  # unsigned int column
 		ctypes.c_int,                   # int type
 		ctypes.c_void_p,                # const void *value
 		ctypes.c_size_t                 # size_t value_len
-	]
+	)
 	f.restype = ctypes.c_int
 
 for f in [ libnsX.netsnmp_table_dataset_add_index ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_table_data_set_p,       # netsnmp_table_data_set *table
 		ctypes.c_ubyte                  # u_char type
-	]
+	)
 	f.restype = None
 
 for f in [ libnsX.netsnmp_table_dataset_remove_and_delete_row ]:
-	f.argtypes = [
+	f.argtypes = (
 		netsnmp_table_data_set_p,       # netsnmp_table_data_set *table
 		netsnmp_table_row_p             # netsnmp_table_row *row
-	]
+	)
+	f.restype = None
 
 # include/net-snmp/agent/snmp_agent.h
 for f in [ libnsa.agent_check_and_process ]:
-	f.argtypes = [
-		ctypes.c_int                    # int block
-	]
+	f.argtypes = (
+		ctypes.c_int,                   # int block
+	)
 	f.restype = ctypes.c_int
@@ -13,7 +13,23 @@
 This module allows to run net-snmp instances with user privileges that do not
 interfere with any system-wide running net-snmp instance. """
 
-import sys, os, atexit, tempfile, subprocess, locale, re, inspect, signal, time, shutil
+import sys, os, atexit, tempfile, subprocess, locale, re, inspect, signal, time, shutil, select
+
+# SLES11 SP2's Python 2.6 has a subprocess module whose CalledProcessError
+# exception does not yet know the third "output" argument, so we monkey-patch
+# support into it. This only needs to be checked once. inspect.getargspec()
+# is gone in recent Python 3 versions, use getfullargspec() there.
+_getargspec = getattr(inspect, "getfullargspec", None) or inspect.getargspec
+if len(_getargspec(subprocess.CalledProcessError.__init__).args) == 3:
+	def _CalledProcessError_init(self, returncode, cmd, output=None):
+		self.returncode = returncode
+		self.cmd        = cmd
+		self.output     = output
+	subprocess.CalledProcessError.__init__ = _CalledProcessError_init
+
+# Clock for timeouts. time.monotonic() is not affected by system clock
+# changes but only available since Python 3.3.
+_monotonic = getattr(time, "monotonic", time.time)
 
 class netsnmpTestEnv(object):
 	""" Implements a net-snmp test environment. """
@@ -40,46 +56,73 @@ class netsnmpTestEnv(object):
 		indexesfile       = os.path.join(self.tmpdir, "mib_indexes")
 
 		# Create a minimal snmpd configuration file
+		conf = (
+			"[snmpd]\n"
+			"rocommunity public 127.0.0.1\n"
+			"rwcommunity simple 127.0.0.1\n"
+			"agentaddress localhost:{0}\n"
+			"informsink localhost:{1}\n"
+			"smuxsocket localhost:{2}\n"
+			"master agentx\n"
+			"agentXSocket {3}\n\n"
+			"[snmp]\n"
+			"persistentDir {4}\n"
+		).format(
+			self.agentport,
+			self.informport,
+			self.smuxport,
+			self.mastersocket,
+			self.statedir
+		)
 		with open(conffile, "w") as f:
-			f.write("[snmpd]\n")
-			f.write("rocommunity public 127.0.0.1\n")
-			f.write("rwcommunity simple 127.0.0.1\n")
-			f.write("agentaddress localhost:{0}\n".format(self.agentport))
-			f.write("informsink localhost:{0}\n".format(self.informport))
-			f.write("smuxsocket localhost:{0}\n".format(self.smuxport))
-			f.write("master agentx\n")
-			f.write("agentXSocket {0}\n\n".format(self.mastersocket))
-			f.write("[snmp]\n")
-			f.write("persistentDir {0}\n".format(self.statedir))
-
-		# Create an empty mib_indexes file
-		open(indexesfile, "w").close()
+			f.write(conf)
+
+		# Create an empty mib_indexes file. We don't need a Python file object
+		# for that, creating it on the OS level will do.
+		os.close(os.open(indexesfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666))
 
 		# Start the snmpd instance
-		cmd = "/usr/sbin/snmpd -r -LE warning -C -c{0} -p{1}".format(
-			conffile, self.pidfile
-		)
-		subprocess.check_call(cmd, shell=True)
+		cmd = [
+			"/usr/sbin/snmpd", "-r", "-LE", "warning", "-C",
+			"-c{0}".format(conffile), "-p{0}".format(self.pidfile)
+		]
+		subprocess.check_call(cmd)
 
 	def shutdown(self):
 		def kill_process(pid):
 			def is_running(pid):
 				return os.path.exists("/proc/{0}".format(pid))
 
+			def wait_for_exit(pid, timeout=None):
+				# snmpd daemonizes, so it is not our child and we can't
+				# waitpid() for it. Where available, a pidfd lets us block
+				# until it exits, otherwise we have to poll.
+				try:
+					fd = os.pidfd_open(pid)
+				except (AttributeError, OSError):
+					if timeout is not None:
+						deadline = _monotonic() + timeout
+					while is_running(pid):
+						if timeout is not None and _monotonic() >= deadline:
+							return
+						time.sleep(0.05)
+				else:
+					try:
+						select.select([fd], [], [], timeout)
+					finally:
+						os.close(fd)
+
 			if not is_running(pid):
 				return
 
-			starttime = time.clock()
 			os.kill(pid, signal.SIGTERM)
-			while time.clock() == starttime:
-				time.sleep(0.25)
+			wait_for_exit(pid, 1.0)
 
 			if not is_running(pid):
 				return
 
 			os.kill(pid, signal.SIGTERM)
-			while is_running(pid):
-				time.sleep(0.25)
+			wait_for_exit(pid)
 
 		# Check for existance of snmpd's PID file
 		if hasattr(self, "pidfile") and os.access(self.pidfile, os.R_OK):
@@ -115,13 +158,20 @@ class netsnmpTestEnv(object):
 		    "data" is the data to set in case of a "set" operation.
 			"datatype" is the type of the data (as specified to "snmpset"). """
 
-		# Compose the SNMP client command
+		# Compose the SNMP client command. We pass it as argument list so
+		# that no shell needs to be started to parse it.
 		if op == "set":
-			cmd = "/usr/bin/snmp{0} -M+. -r0 -v 2c -c simple localhost:6555 {1} {2} {3}"
-			cmd = cmd.format(op, oid, datatype, data)
+			cmd = [
+				"/usr/bin/snmp{0}".format(op), "-M+.", "-r0", "-v", "2c",
+				"-c", "simple", "localhost:6555",
+				str(oid), str(datatype), str(data)
+			]
 		else:
-			cmd = "/usr/bin/snmp{0} -M+. -r0 -v 2c -c public localhost:6555 {1}"
-			cmd = cmd.format(op, oid)
+			cmd = [
+				"/usr/bin/snmp{0}".format(op), "-M+.", "-r0", "-v", "2c",
+				"-c", "public", "localhost:6555",
+				str(oid)
+			]
 
 		# Python 2.6 (used eg. in SLES11SP2) does not yet know about
 		# subprocess.check_output(), so we wrap subprocess.Popen() instead.
@@ -129,7 +179,7 @@ class netsnmpTestEnv(object):
 		# Execute the command with stderr redirected to stdout and stdout
 		# redirected to a pipe that we capture below
 		proc = subprocess.Popen(
-			cmd, shell=True, env={ "LANG": "C" },
+			cmd, env={ "LANG": "C" },
 			stdout=subprocess.PIPE, stderr=subprocess.STDOUT
 		)
 		output = proc.communicate()[0].strip()
@@ -155,16 +205,6 @@ class netsnmpTestEnv(object):
 		if re.search("Reason: notWritable \(That object does not support modification\)", output):
 			raise netsnmpTestEnv.NotWritableError(oid)
 
-		# SLES11 SP2's Python 2.6 has a subprocess module whose
-		# CalledProcessError exception does not yet know the third "output"
-		# argument, so we monkey-patch support into it
-		if len(inspect.getargspec(subprocess.CalledProcessError.__init__).args) == 3:
-			def new_init(self, returncode, cmd, output=None):
-				self.returncode = returncode
-				self.cmd        = cmd
-				self.output     = output
-			subprocess.CalledProcessError.__init__ = new_init
-
 		raise subprocess.CalledProcessError(rc, cmd, output)
 
 	@classmethod
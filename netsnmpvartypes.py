@@ -6,14 +6,54 @@
 # SNMP scalar variable types
 #
 
-import ctypes, socket, struct
+import sys, ctypes, socket, struct
 from netsnmpapi import *
 
 # Maximum string size supported by python-netsnmpagent
 MAX_STRING_SIZE = 1024
 
-# Helper function to determine if "x" is a number
+# Exception raised on errors. It is defined here rather than in the
+# netsnmpagent module, which imports it from here, so that the SNMP variable
+# types can raise it as well.
+class netsnmpAgentException(Exception):
+	pass
+
+# Bound unpack method of a precompiled struct format for converting IP
+# addresses from their dotted decimal string representation
+_unpack_uint = struct.Struct("I").unpack
+
+# Helper functions to convert an IPv4 address, stored as unsigned integer in
+# network byte order, to its dotted decimal string representation and to host
+# byte order, respectively. Plain integer arithmetic avoids the intermediate
+# bytes objects and tuples that struct and socket functions would create.
+if sys.byteorder == "little":
+	def _ipv4(v):
+		return "%d.%d.%d.%d" % (v & 0xFF, (v >> 8) & 0xFF, (v >> 16) & 0xFF, v >> 24)
+
+	def _ntohl(v):
+		return ((v & 0xFF) << 24) | ((v & 0xFF00) << 8) \
+		     | ((v >> 8) & 0xFF00) | (v >> 24)
+else:
+	def _ipv4(v):
+		return "%d.%d.%d.%d" % (v >> 24, (v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF)
+
+	def _ntohl(v):
+		return v
+
+# Python number types that can be recognized by a plain type check
+try:
+	# Python 2.x
+	_NUMBER_TYPES = (int, long, float)
+except NameError:
+	# Python 3.x
+	_NUMBER_TYPES = (int, float)
+
+# Helper function to determine if "x" is a number. The common number types
+# are recognized by a type check, anything else (eg. decimal.Decimal or
+# numpy integers) by whether it supports addition with a number.
 def isnum(x):
+	if isinstance(x, _NUMBER_TYPES):
+		return True
 	try:
 		x + 1
 		return True
@@ -22,7 +62,26 @@ def isnum(x):
 
 # Base class for scalar SNMP variables.
 # This class is not supposed to be instantiated directly.
+#
+# The attributes common to all SNMP variable classes are declared through
+# __slots__ here and in the other internal base classes. The public classes
+# deliberately do not declare __slots__, so that users can still set their
+# own attributes on their instances.
 class _VarType(object):
+	__slots__ = (
+		"_cvar",            # ctypes object holding the actual value
+		"_cref",            # Cached reference to _cvar (fixed size types)
+		"_data_size",       # Current size of the value in bytes
+		"_max_size",        # Maximum size of the value in bytes
+		"_watcher",         # netsnmp_watcher_info, if registered as scalar
+	)
+
+	# The following are the same for all instances of a class and are thus
+	# defined as class attributes by the inheriting classes:
+	# _asntype:       ASN type of the variable
+	# _ctype:         ctypes type/constructor for _cvar
+	# _watcher_flags: Flags for the netsnmp_watcher_info structure
+
 	def value(self):
 		val = self._cvar.value
 
@@ -40,71 +99,88 @@ class _VarType(object):
 # Intermediate class for scalar SNMP variables of fixed size.
 # This class is not supposed to be instantiated directly.
 class _FixedSizeVarType(_VarType):
+	__slots__ = ()
+
+	# Flags for the netsnmp_watcher_info structure
+	_watcher_flags = WATCHER_FIXED_SIZE
+
 	def __init__(self, initval):
 		# Create the ctypes class instance representing the variable
-		# for handling by the net-snmp C API. self._ctype is supposed
-		# to have been set by an inheriting class.
+		# for handling by the net-snmp C API. _ctype is supposed to have
+		# been defined by an inheriting class.
 		self._cvar      = self._ctype(initval if isnum(initval) else b(initval))
 		self._data_size = ctypes.sizeof(self._cvar)
 		self._max_size  = self._data_size
 
-		# Flags for the netsnmp_watcher_info structure
-		self._watcher_flags = WATCHER_FIXED_SIZE
+		# The address of the variable never changes, so we can create the
+		# reference passed to the net-snmp C API once and reuse it
+		self._cref      = ctypes.byref(self._cvar)
 
 		return self
 
-	def cref(self, **kwargs):
-		return ctypes.byref(self._cvar)
+	def value(self):
+		# ctypes already returns Python ints and floats for all fixed size
+		# types, so there's nothing to convert
+		return self._cvar.value
+
+	def cref(self):
+		return self._cref
+
+	# Fixed size values are passed the same way when used as table index
+	cref_as_index = cref
 
 	def update(self, val):
 		self._cvar.value = val
 
 class Integer32(_FixedSizeVarType):
+	_asntype = ASN_INTEGER
+	_ctype   = ctypes.c_long
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_INTEGER
-		self._ctype   = ctypes.c_long
 		super(Integer32, self).__init__(initval)
 
 class Unsigned32(_FixedSizeVarType):
+	_asntype = ASN_UNSIGNED
+	_ctype   = ctypes.c_ulong
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_UNSIGNED
-		self._ctype   = ctypes.c_ulong
 		super(Unsigned32, self).__init__(initval)
 
 class Counter32(_FixedSizeVarType):
+	_asntype = ASN_COUNTER
+	_ctype   = ctypes.c_ulong
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_COUNTER
-		self._ctype   = ctypes.c_ulong
 		super(Counter32, self).__init__(initval)
 
 	def update(self, val):
-		# Cut off values larger than 32 bits
-		if val >> 32:
-			val = val & 0xFFFFFFFF
-		super(Counter32, self).update(val)
+		# Cut off values larger than 32 bits. Masking is a no-op for values
+		# in range, so we can do it unconditionally.
+		super(Counter32, self).update(val & 0xFFFFFFFF)
 
 	def increment(self, count=1):
 		self.update(self.value() + count)
 
 class Counter64(_FixedSizeVarType):
+	_asntype = ASN_COUNTER64
+	_ctype   = counter64
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_COUNTER64
-		self._ctype   = counter64
 		super(Counter64, self).__init__(initval)
 
 	def update(self, val):
-		# Cut off values larger than 64 bits
-		if val >> 64:
-			val = val & 0xFFFFFFFFFFFFFFFF
-		super(Counter64, self).update(val)
+		# Cut off values larger than 64 bits. Masking is a no-op for values
+		# in range, so we can do it unconditionally.
+		super(Counter64, self).update(val & 0xFFFFFFFFFFFFFFFF)
 
 	def increment(self, count=1):
 		self.update(self.value() + count)
 
 class Gauge32(_FixedSizeVarType):
+	_asntype = ASN_GAUGE
+	_ctype   = ctypes.c_ulong
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_GAUGE
-		self._ctype   = ctypes.c_ulong
 		super(Gauge32, self).__init__(initval)
 
 	def update(self, val):
@@ -117,17 +193,19 @@ class Gauge32(_FixedSizeVarType):
 		self.update(self.value() + count)
 
 class TimeTicks(_FixedSizeVarType):
+	_asntype = ASN_TIMETICKS
+	_ctype   = ctypes.c_ulong
+
 	def __init__(self, initval = 0):
-		self._asntype = ASN_TIMETICKS
-		self._ctype   = ctypes.c_ulong
 		super(TimeTicks, self).__init__(initval)
 
 # RFC 2579 TruthValues should offer a bool interface to Python but
 # are stored as Integers using the special constants TV_TRUE and TV_FALSE
 class TruthValue(_FixedSizeVarType):
+	_asntype = ASN_INTEGER
+	_ctype   = ctypes.c_int
+
 	def __init__(self, initval = False):
-		self._asntype = ASN_INTEGER
-		self._ctype   = ctypes.c_int
 		super(TruthValue, self).__init__(TV_TRUE if initval else TV_FALSE)
 
 	def value(self):
@@ -140,105 +218,119 @@ class TruthValue(_FixedSizeVarType):
 			raise netsnmpAgentException("TruthValue must be True or False")
 
 class Float(_FixedSizeVarType):
+	_asntype = ASN_OPAQUE_FLOAT
+	_ctype   = ctypes.c_float
+
 	def __init__(self, initval = 0.0):
-		self._asntype = ASN_OPAQUE_FLOAT
-		self._ctype   = ctypes.c_float
 		super(Float, self).__init__(initval)
 
 # IP v4 addresses are stored as unsigned integers but we want the Python
 # interface to use strings.
 class IpAddress(_FixedSizeVarType):
+	_asntype = ASN_IPADDRESS
+	_ctype   = ctypes.c_uint
+
 	def __init__(self, initval = "0.0.0.0"):
-		self._asntype   = ASN_IPADDRESS
-		self._ctype     = ctypes.c_uint
 		super(IpAddress, self).__init__(0)
 		self.update(initval)
 
+		# Host byte order copy of the value for use as table index (see
+		# cref_as_index() below) and a reusable reference to it
+		self._cidx     = ctypes.c_uint(0)
+		self._cref_idx = ctypes.byref(self._cidx)
+
 	def value(self):
 		# Get string representation of IP address.
-		return socket.inet_ntoa(
-			struct.pack("I", self._cvar.value)
-		)
+		return _ipv4(self._cvar.value)
 
-	def cref(self, **kwargs):
+	def cref_as_index(self):
 		# Due to an unfixed Net-SNMP issue (see
 		# https://sourceforge.net/p/net-snmp/bugs/2136/) we have
 		# to convert the value to host byte order if it shall be
 		# used as table index.
-		if kwargs.get("is_table_index", False) == False:
-			return ctypes.byref(self._cvar)
-		else:
-			_cidx = ctypes.c_uint(0)
-			_cidx.value = struct.unpack("I", struct.pack("!I", self._cvar.value))[0]
-			return ctypes.byref(_cidx)
+		self._cidx.value = _ntohl(self._cvar.value)
+		return self._cref_idx
 
 	def update(self, val):
 		# Convert dotted decimal IP address string to ctypes
 		# unsigned int in network byte order.
-		self._cvar.value = struct.unpack(
-			"I",
+		self._cvar.value = _unpack_uint(
 			socket.inet_aton(val if val else "0.0.0.0")
 		)[0]
 
 # Intermediate class for scalar SNMP variables of variable size.
 # This class is not supposed to be instantiated directly.
 class _MaxSizeVarType(_VarType):
+	__slots__ = ()
+
+	# Flags for the netsnmp_watcher_info structure
+	_watcher_flags = WATCHER_MAX_SIZE
+
 	def __init__(self, initval, max_size):
 		# Create the ctypes class instance representing the variable
-		# for handling by the net-snmp C API. self._ctype is supposed
-		# to have been set by an inheriting class. Since it is assumed to
+		# for handling by the net-snmp C API. _ctype is supposed to have
+		# been defined by an inheriting class. Since it is assumed to
 		# have no fixed size, we pass the maximum size as second
 		# argument to the constructor.
 		self._cvar      = self._ctype(initval if isnum(initval) else b(initval), max_size)
 		self._data_size = len(self._cvar.value)
 		self._max_size  = max(self._data_size, max_size)
 
-		# Flags for the netsnmp_watcher_info structure
-		self._watcher_flags = WATCHER_MAX_SIZE
-
 		return self
 
-	def cref(self, **kwargs):
+	def cref(self):
 		return self._cvar
 
+	cref_as_index = cref
+
 	def update(self, val):
-		self._cvar.value = val
-		if len(val) > self._max_size:
+		# Check the size before touching the buffer so that an oversized
+		# value leaves the current value intact
+		size = len(val)
+		if size > self._max_size:
 			raise netsnmpAgentException(
 				"Value passed to update() truncated: {0} > {1} "
-				"bytes!".format(len(val), self._max_size)
+				"bytes!".format(size, self._max_size)
 			)
-		self._data_size = self._watcher.contents.data_size = len(val)
+		self._cvar.value = val
+		self._data_size = self._watcher.contents.data_size = size
 
 class _String(_MaxSizeVarType):
-	def __init__(self, initval = ""):
-		self._asntype = ASN_OCTET_STR
+	__slots__ = ()
+
+	_asntype = ASN_OCTET_STR
 
-		# Note we can't use ctypes.c_char_p here since that creates an immutable
-		# type and net-snmp _can_ modify the buffer (unless writable is False).
-		self._ctype   = ctypes.create_string_buffer
+	# Note we can't use ctypes.c_char_p here since that creates an immutable
+	# type and net-snmp _can_ modify the buffer (unless writable is False).
+	# create_string_buffer is a plain function, so it must not become a
+	# bound method when accessed through an instance.
+	_ctype   = staticmethod(ctypes.create_string_buffer)
 
-		# Also note that while net-snmp 5.5 introduced a WATCHER_SIZE_STRLEN flag,
-		# we have to stick to WATCHER_MAX_SIZE for now to support net-snmp 5.4.x
-		# (used eg. in SLES 11 SP2 and Ubuntu 12.04 LTS).
-		self._flags   = WATCHER_MAX_SIZE
+	# Also note that while net-snmp 5.5 introduced a WATCHER_SIZE_STRLEN flag,
+	# we have to stick to the WATCHER_MAX_SIZE flag inherited from
+	# _MaxSizeVarType for now to support net-snmp 5.4.x (used eg. in SLES 11
+	# SP2 and Ubuntu 12.04 LTS).
 
+	def __init__(self, initval = ""):
 		super(_String, self).__init__(initval, MAX_STRING_SIZE)
 
 # Whereas an OctetString can contain all byte values, a DisplayString is
 # restricted to ASCII characters only.
 class OctetString(_String):
 	def __init__(self, initval = ""):
+		# Encode the initial value only once: the parent classes pass bytes
+		# through unchanged and we need its length in bytes here, too.
+		initval = b(initval)
 		super(OctetString, self).__init__(initval)
-		self._data_size = len(b(initval))
+		self._data_size = len(initval)
 
 	def value(self):
-		val = self._cvar.raw
 		if hasattr(self, "_watcher"):
 			size = self._watcher.contents.data_size
 		else:
 			size = self._data_size
-		return b(val[:size])
+		# Copy only the bytes actually used instead of the whole buffer
+		return ctypes.string_at(self._cvar, size)
 
 class DisplayString(_String):
 	pass
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# python-netsnmpagent module
+# Copyright (c) 2013-2019 Pieter Hollants <pieter@hollants.com>
+# Licensed under the GNU Lesser Public License (LGPL) version 3
+#
+# Unit tests for the netsnmpagent module's helper functions. These do not
+# need a net-snmp test environment.
+#
+
+import sys
+from nose.tools import *
+sys.path.insert(1, "..")
+import netsnmpagent
+
+@raises(netsnmpagent.netsnmpAgentException)
+def test_AddIndexFailureRaisesException():
+	""" _add_index() raises Exception if net-snmp fails to add the index
+
+	This tests that a NULL pointer returned by snmp_varlist_add_variable(),
+	which net-snmp does eg. when running out of memory, triggers a
+	netsnmpAgentException instead of going unnoticed. The net-snmp function
+	is replaced by a stub returning a NULL pointer for this purpose. """
+
+	varlist_add = netsnmpagent._snmp_varlist_add_variable
+	netsnmpagent._snmp_varlist_add_variable = \
+		lambda *args: netsnmpagent.netsnmp_variable_list_p()
+	try:
+		netsnmpagent._add_index(None, netsnmpagent.netsnmpvartypes.Integer32(1))
+	finally:
+		netsnmpagent._snmp_varlist_add_variable = varlist_add
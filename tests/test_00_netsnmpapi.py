@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# python-netsnmpagent module
+# Copyright (c) 2013-2019 Pieter Hollants <pieter@hollants.com>
+# Licensed under the GNU Lesser Public License (LGPL) version 3
+#
+# Unit tests for the netsnmpapi module's helper functions. These do not need
+# a net-snmp test environment.
+#
+
+import sys
+from nose.tools import *
+sys.path.insert(1, "..")
+import netsnmpapi
+
+def test_u_ByteStrings_eq_NativeStrings():
+	""" u(byte string) == native string
+
+	This tests that u() turns byte strings into native strings, ie. decodes
+	them on Python 3 and returns them unchanged on Python 2. """
+
+	result = netsnmpapi.u(b"abc")
+	eq_(result, "abc")
+	ok_(isinstance(result, str), "u() did not return a native string")
+
+def test_u_NativeStrings_unchanged():
+	""" u(native string) returns it unchanged """
+
+	result = netsnmpapi.u("abc")
+	eq_(result, "abc")
+	ok_(isinstance(result, str), "u() did not return a native string")
+
+def test_u_UnicodeStrings_unchanged():
+	""" u(Unicode string) returns it unchanged """
+
+	eq_(netsnmpapi.u(u"Ä"), u"Ä")
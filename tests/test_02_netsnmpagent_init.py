@@ -14,6 +14,15 @@ sys.path.insert(1, "..")
 from netsnmptestenv import netsnmpTestEnv
 import netsnmpagent
 
+# Path to the TEST-MIB in our tests directory, determined only once
+TEST_MIB_PATH = os.path.join(
+	os.path.abspath(os.path.dirname(__file__)),
+	"TEST-MIB.txt"
+)
+
+# Clock for log message timestamps (time.monotonic() needs Python 3.3)
+monotonic = getattr(time, "monotonic", time.time)
+
 def setUp(self):
 	global testenv
 
@@ -51,7 +60,7 @@ def test_Instantiation():
 		# Store net-snmp log messages in our buffer so we can have a look
 		# at them later on
 		logbuf.append({
-			"time": time.clock(),
+			"time": monotonic(),
 			"prio": msgprio,
 			"text": msgtext
 		})
@@ -65,13 +74,11 @@ def test_Instantiation():
 	# - uses its statedir
 	# - loads the TEST-MIB from our tests directory
 	# - uses the net-snmp logging handler defined above
-	testMIBPath = os.path.abspath(os.path.dirname(__file__)) + \
-				  "/TEST-MIB.txt"
 	agent = netsnmpagent.netsnmpAgent(
 		AgentName      = "netsnmpAgentTestAgent",
 		MasterSocket   = testenv.mastersocket,
 		PersistenceDir = testenv.statedir,
-		MIBFiles       = [ testMIBPath ],
+		MIBFiles       = [ TEST_MIB_PATH ],
 		LogHandler     = NetSNMPLogHandler,
 	)
 
@@ -96,6 +103,35 @@ def test_SecondGetFails():
 
 	testenv.snmpget("TEST-MIB::testUnsigned32NoInitval.0")
 
+@timed(1)
+def test_MissingMIBFileRaisesExceptionNamingIt():
+	""" Registering with a missing MIB file raises Exception naming it
+
+	This tests that, for a netsnmpAgent instance with a MIB file that does
+	not exist, the failure of loading that file gets detected when the first
+	SNMP object gets registered and leads to a netsnmpAgentException whose
+	message names the MIB file. """
+
+	global testenv
+
+	missing_mib_path = TEST_MIB_PATH + ".missing"
+	badagent = netsnmpagent.netsnmpAgent(
+		AgentName      = "netsnmpAgentTestAgent",
+		MasterSocket   = testenv.mastersocket,
+		PersistenceDir = testenv.statedir,
+		MIBFiles       = [ missing_mib_path ],
+	)
+
+	try:
+		badagent.Unsigned32(oidstr = "TEST-MIB::testUnsigned32NoInitval")
+	except netsnmpagent.netsnmpAgentException as e:
+		ok_(
+			missing_mib_path in str(e),
+			"MIB file name missing from exception message"
+		)
+	else:
+		ok_(False, "No netsnmpAgentException raised")
+
 @timed(1)
 def test_StartingAgentConnectsToMaster():
 	""" Calling agent.start() connects to master agent """
@@ -106,6 +142,31 @@ def test_StartingAgentConnectsToMaster():
 
 	ok_(in_netsnmp_log("NET-SNMP version .* subagent connected") == True, "No connection to master agent")
 
+@timed(1)
+def test_UnrelatedWarningDoesNotFailConnect():
+	""" Unrelated warnings are not mistaken for connection failures
+
+	This tests that a warning logged by net-snmp while the agent is
+	connecting to the master agent for the first time neither makes the
+	connection attempt fail nor gets swallowed, unless it actually reports
+	a connection failure. """
+
+	global agent
+
+	status = agent._status
+	agent._status = netsnmpagent.netsnmpAgentStatus.FIRSTCONNECT
+	try:
+		netsnmpagent.libnsa.snmp_log(
+			netsnmpagent.LOG_WARNING,
+			b"%s\n",
+			b"Unrelated test warning"
+		)
+		eq_(agent._status, netsnmpagent.netsnmpAgentStatus.FIRSTCONNECT)
+	finally:
+		agent._status = status
+
+	ok_(in_netsnmp_log("Unrelated test warning") == True, "Warning not logged")
+
 @timed(1)
 @raises(netsnmpTestEnv.MIBUnavailableError)
 def test_ThirdGetFails():
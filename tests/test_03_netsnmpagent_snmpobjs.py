@@ -14,6 +14,12 @@ sys.path.insert(1, "..")
 from netsnmptestenv import netsnmpTestEnv
 import netsnmpagent
 
+# Path to the TEST-MIB in our tests directory, determined only once
+TEST_MIB_PATH = os.path.join(
+	os.path.abspath(os.path.dirname(__file__)),
+	"TEST-MIB.txt"
+)
+
 def setUp(self):
 	global testenv, agent
 	global settableInteger32, settableUnsigned32, settableTimeTicks
@@ -25,13 +31,11 @@ def setUp(self):
 	# - connects to the net-snmp test environment's snmpd instance
 	# - uses its statedir
 	# - loads the TEST-MIB from our tests directory
-	testMIBPath = os.path.abspath(os.path.dirname(__file__)) + \
-				  "/TEST-MIB.txt"
 	agent = netsnmpagent.netsnmpAgent(
 		AgentName      = "netsnmpAgentTestAgent",
 		MasterSocket   = testenv.mastersocket,
 		PersistenceDir = testenv.statedir,
-		MIBFiles       = [ testMIBPath ],
+		MIBFiles       = [ TEST_MIB_PATH ],
 	)
 
 	# Test OIDs for Integer32 scalar type
@@ -368,11 +372,13 @@ def setUp(self):
 	agent.start()
 
 	# Create a separate thread to implement the absolutely most
-	# minimalistic possible agent doing nothing but request handling
+	# minimalistic possible agent doing nothing but request handling.
+	# Block inside net-snmp's select() so the thread only wakes up on
+	# actual AgentX traffic instead of spinning on a CPU core.
 	agent.loop = True
 	def RequestHandler():
-		while self.agent.loop:
-			agent.check_and_process(False)
+		while agent.loop:
+			agent.check_and_process(True)
 
 	agent.thread = threading.Thread(target=RequestHandler)
 	agent.thread.daemon = True
@@ -383,13 +389,25 @@ def tearDown(self):
 
 	if "agent" in globals():
 		agent.loop = False
-		if hasattr(agent, "thread"):
-			agent.thread.join()
-		agent.shutdown()
 
+	# Stopping the master snmpd closes the AgentX connection, which wakes
+	# up the request handler thread blocked in check_and_process()
 	if "testenv" in globals():
 		testenv.shutdown()
 
+	if "agent" in globals():
+		if hasattr(agent, "thread"):
+			agent.thread.join(5)
+
+			# Shutting down net-snmp while the thread may still be inside
+			# check_and_process() could crash the interpreter
+			if agent.thread.is_alive():
+				raise RuntimeError(
+					"Request handler thread did not terminate, "
+					"not shutting down the agent!"
+				)
+		agent.shutdown()
+
 @timed(1)
 def test_GET_Integer32WithoutInitval_eq_Zero():
 	""" GET(Integer32()) == 0
@@ -1499,3 +1517,29 @@ def test_GET_SET_DisplayStringWithoutInterval_abcdef_eq_abcdef():
 	(data, datatype) = testenv.snmpget("TEST-MIB::testDisplayStringNoInitval.0")
 	eq_(datatype, "STRING")
 	eq_(data, "abcdef")
+
+@timed(1)
+def test_UPDATE_DisplayStringOversized_raises_Exception():
+	""" DisplayString.update(<oversized value>) raises Exception
+
+	This tests that calling update() on a previously instantiated scalar
+	variable of type DisplayString with a value exceeding the maximum string
+	size of 1024 bytes triggers a netsnmpAgentException and leaves the
+	current value intact, both for the netsnmpagent SNMP object and when
+	accessed through snmpget. """
+
+	global testenv, settableDisplayString
+
+	oldval = settableDisplayString.value()
+
+	assert_raises(
+		netsnmpagent.netsnmpAgentException,
+		settableDisplayString.update,
+		b"A" * 1025
+	)
+
+	eq_(settableDisplayString.value(), oldval)
+
+	(data, datatype) = testenv.snmpget("TEST-MIB::testDisplayStringNoInitval.0")
+	eq_(datatype, "STRING")
+	eq_(data, oldval)
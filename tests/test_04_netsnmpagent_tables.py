@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# python-netsnmpagent module
+# Copyright (c) 2013-2019 Pieter Hollants <pieter@hollants.com>
+# Licensed under the GNU Lesser Public License (LGPL) version 3
+#
+# Integration tests for the netsnmpagent module (SNMP tables)
+#
+
+import sys, os
+from nose.tools import *
+sys.path.insert(1, "..")
+from netsnmptestenv import netsnmpTestEnv
+import netsnmpagent
+
+# Path to the TEST-MIB in our tests directory, determined only once
+TEST_MIB_PATH = os.path.join(
+	os.path.abspath(os.path.dirname(__file__)),
+	"TEST-MIB.txt"
+)
+
+def setUp(self):
+	global testenv, agent, testTable
+
+	testenv = netsnmpTestEnv()
+
+	# Create a new netsnmpAgent instance which
+	# - connects to the net-snmp test environment's snmpd instance
+	# - uses its statedir
+	# - loads the TEST-MIB from our tests directory
+	agent = netsnmpagent.netsnmpAgent(
+		AgentName      = "netsnmpAgentTestAgent",
+		MasterSocket   = testenv.mastersocket,
+		PersistenceDir = testenv.statedir,
+		MIBFiles       = [ TEST_MIB_PATH ],
+	)
+
+	# Test table with an Integer32 index and a Counter64 column default
+	# that does not fit into 32 bits
+	testTable = agent.Table(
+		oidstr  = "TEST-MIB::testTable",
+		indexes = [
+			agent.Integer32()
+		],
+		columns = [
+			(2, agent.Counter64(4294967297)),
+			(3, agent.DisplayString("Unknown"))
+		]
+	)
+
+	# Connect to master snmpd instance
+	agent.start()
+
+def tearDown(self):
+	global testenv, agent
+
+	if "agent" in globals():
+		agent.shutdown()
+
+	if "testenv" in globals():
+		testenv.shutdown()
+
+@timed(1)
+def test_Counter64ColumnDefault_eq_Initval():
+	""" Table.value() returns a Counter64 column default as 64-bit value
+
+	This tests that the default value of a Counter64 table column with an
+	initval of 4294967297 is returned as such instead of being read as a
+	32-bit integer. """
+
+	global testTable
+
+	eq_(testTable.value()[0][2], { "type": "Counter64", "value": 4294967297 })
+
+@timed(1)
+def test_AddRow_values_eq_RowCells():
+	""" Table.value() returns the cells of an added row
+
+	This tests that a row added with index 1 and cells of type Counter64
+	and DisplayString set shows up in Table.value() under its index with
+	the cells' values. """
+
+	global agent, testTable
+
+	row = testTable.addRow([ agent.Integer32(1) ])
+	row.setRowCell(2, agent.Counter64(8589934593))
+	row.setRowCell(3, agent.DisplayString("abc"))
+
+	eq_(testTable.value()[1], { 2: 8589934593, 3: "abc" })